@@ -5,6 +5,8 @@ import sys
 import math
 from datetime import datetime
 from dotenv import load_dotenv
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.api_core.exceptions import FailedPrecondition
 load_dotenv()  # loads .env file
 
 
@@ -15,6 +17,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 #                FIREBASE INITIALIZATION (SAFE)
 # -------------------------------------------------------------
 from firebase_config.firebase_connection import connect_to_firestore
+from utils.shared_cache import SharedSnapshotCache, MmapSnapshotStore, to_numpy_frame
+from utils.doctor_notes import changed_doctor_notes
 
 db = connect_to_firestore()
 if not db:
@@ -44,7 +48,6 @@ def ai_health_risk_score(steps, pain_level, medicine_taken, sleep_hours=None, mo
 # -------------------------------------------------------------
 #                       FETCH DOCTORS
 # -------------------------------------------------------------
-@st.cache_data(ttl=10)
 def fetch_doctors():
     docs = db.collection("doctors").stream()
     out = {}
@@ -55,16 +58,19 @@ def fetch_doctors():
 # -------------------------------------------------------------
 #                  FETCH PATIENT DATA
 # -------------------------------------------------------------
-@st.cache_data(ttl=5)
 def fetch_patients():
     docs = db.collection("patients").stream()
     out = []
     for d in docs:
         data = d.to_dict()
         data["_doc_id"] = d.id
+        # Kept as an RFC 3339 string so it survives caching and DataFrames;
+        # used as a write precondition to detect conflicting note edits.
+        data["_update_time"] = d.update_time.rfc3339() if d.update_time else None
         data["timestamp_parsed"] = pd.to_datetime(data.get("timestamp"), errors="coerce")
         out.append(data)
-    return out
+    # Columnar frame so the shared snapshot can hand out zero-copy views
+    return pd.DataFrame(out)
 
 # -------------------------------------------------------------
 #      CLEAN MAPPING OF OLD DOCTOR IDS → NEW NAMES
@@ -79,6 +85,65 @@ DOCTOR_NAME_MAPPING = {
 def normalize_doctor_name(raw_name):
     return DOCTOR_NAME_MAPPING.get(raw_name, raw_name)
 
+# -------------------------------------------------------------
+#        SHARED CACHE (ONE SNAPSHOT FOR ALL WORKER PROCESSES)
+# -------------------------------------------------------------
+def fetch_doctors_frame():
+    # Snapshots are columnar, so the name -> password map is stored as two columns
+    return pd.DataFrame(list(fetch_doctors().items()), columns=["name", "password"])
+
+@st.cache_resource
+def shared_caches():
+    cache_dir = os.getenv("SHARED_CACHE_DIR")  # defaults to a private dir in /dev/shm
+    return {
+        "doctors": SharedSnapshotCache(fetch_doctors_frame, ttl=10, store=MmapSnapshotStore("doctors", cache_dir)),
+        "patients": SharedSnapshotCache(fetch_patients, ttl=5, store=MmapSnapshotStore("patients", cache_dir)),
+    }
+
+# -------------------------------------------------------------
+#              BATCHED DOCTOR NOTES (TABLE MODE)
+# -------------------------------------------------------------
+NOTES_EDITOR_COLUMNS = ["name", "timestamp", "risk_level", "risk_score",
+                        "pain_level", "steps_walked", "notes", "doctor_notes"]
+FIRESTORE_BATCH_LIMIT = 500
+
+def commit_doctor_notes(changes):
+    """
+    Writes all changed notes in one atomic batch. Each update is guarded by
+    the document's last update time, so a conflicting edit rejects the whole
+    batch. Callers must keep `changes` within FIRESTORE_BATCH_LIMIT.
+    """
+    batch = db.batch()
+    for doc_id, (new_notes, update_time) in changes.items():
+        ref = db.collection("patients").document(doc_id)
+        option = None
+        if update_time:
+            option = db.write_option(
+                last_update_time=DatetimeWithNanoseconds.from_rfc3339(update_time)
+            )
+        batch.update(ref, {"doctor_notes": new_notes}, option=option)
+    batch.commit()
+
+def refresh_patients_cache():
+    try:
+        shared_caches()["patients"].invalidate()
+    except Exception as e:
+        # Not fatal: the shared snapshot catches up on its next TTL refresh
+        print("❌ Patient cache refresh failed:", str(e))
+
+def build_notes_baseline(doctor, frame, version):
+    """Snapshot of the table as first shown, keyed by _doc_id, kept in session state."""
+    notes_df = frame.set_index("_doc_id")
+    for col in NOTES_EDITOR_COLUMNS + ["_update_time"]:
+        if col not in notes_df.columns:
+            notes_df[col] = None
+    notes_df["doctor_notes"] = notes_df["doctor_notes"].fillna("").astype(str)
+    return {
+        "doctor": doctor,
+        "version": version,
+        "frame": notes_df[NOTES_EDITOR_COLUMNS + ["_update_time"]].copy(),
+    }
+
 # -------------------------------------------------------------
 #                     STREAMLIT UI
 # -------------------------------------------------------------
@@ -88,7 +153,8 @@ st.markdown("<h1>Doctor Dashboard</h1>", unsafe_allow_html=True)
 # -------------------------------------------------------------
 #                   DOCTOR LOGIN PAGE
 # -------------------------------------------------------------
-doctors = fetch_doctors()
+doctors_df = to_numpy_frame(shared_caches()["doctors"].read())
+doctors = dict(zip(doctors_df["name"], doctors_df["password"]))
 doctor_names = ["Select Doctor"] + list(doctors.keys())
 
 if "logged_in" not in st.session_state:
@@ -114,14 +180,10 @@ if not st.session_state.logged_in:
 current_doctor = st.session_state.doctor_name
 st.markdown(f"Logged in as: **{current_doctor}**")
 
-patients_raw = fetch_patients()
-processed_patients = []
-for p in patients_raw:
-    p["assigned_doctor"] = normalize_doctor_name(p.get("assigned_doctor", "Unassigned"))
-    processed_patients.append(p)
-
-df = pd.DataFrame(processed_patients)
-df = df[df["assigned_doctor"] == current_doctor]
+df = shared_caches()["patients"].read()
+df = df.assign(assigned_doctor=df["assigned_doctor"].fillna("Unassigned").map(normalize_doctor_name))
+# Only this doctor's rows leave the shared snapshot, as plain pandas columns
+df = to_numpy_frame(df[df["assigned_doctor"] == current_doctor])
 
 if df.empty:
     st.warning(f"No patients assigned yet for {current_doctor}.")
@@ -144,6 +206,68 @@ for _, r in df.iterrows():
 df_final = pd.DataFrame(final_rows)
 df_final = df_final.sort_values(by=["risk_score", "timestamp_parsed"], ascending=[False, True])
 
+view_mode = st.radio("View:", ["Cards", "Notes Table"], horizontal=True)
+
+# -------------------------------------------------------------
+#            NOTES TABLE: EDIT ALL, SAVE ONCE
+# -------------------------------------------------------------
+if view_mode == "Notes Table":
+    # The table is rendered from the baseline captured when it was first
+    # shown, not from the (frequently refreshed) cache. Diffs and update-time
+    # preconditions therefore refer to exactly what the doctor edited, and a
+    # re-sort of the live data cannot shift edits onto other rows.
+    baseline = st.session_state.get("notes_baseline")
+    if baseline is None or baseline["doctor"] != current_doctor or baseline.get("stale"):
+        version = baseline["version"] + 1 if baseline else 0
+        baseline = build_notes_baseline(current_doctor, df_final, version)
+        st.session_state.notes_baseline = baseline
+    notes_df = baseline["frame"]
+
+    if st.button("Reload Table"):
+        st.session_state.notes_baseline = build_notes_baseline(
+            current_doctor, df_final, baseline["version"] + 1
+        )
+        st.rerun()
+
+    # A form keeps edits client-side until the doctor saves, so typing
+    # in the table does not rerun the script.
+    with st.form("doctor_notes_form"):
+        edited_df = st.data_editor(
+            notes_df[NOTES_EDITOR_COLUMNS],
+            # New key per baseline so stale positional edits are never replayed
+            key=f"doctor_notes_editor_{baseline['version']}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in NOTES_EDITOR_COLUMNS if c != "doctor_notes"],
+            column_config={
+                "doctor_notes": st.column_config.TextColumn("Doctor Notes", width="large"),
+            },
+        )
+        save_all = st.form_submit_button("Save All Notes")
+
+    if save_all:
+        changes = changed_doctor_notes(notes_df, edited_df)
+        if not changes:
+            st.info("No notes changed.")
+        elif len(changes) > FIRESTORE_BATCH_LIMIT:
+            st.error(f"❌ {len(changes)} notes changed; save at most "
+                     f"{FIRESTORE_BATCH_LIMIT} at a time. Nothing was saved.")
+        else:
+            try:
+                commit_doctor_notes(changes)
+                st.success(f"Saved notes for {len(changes)} patient(s).")
+                # Next render starts from the freshly saved data
+                baseline["stale"] = True
+                refresh_patients_cache()
+            except FailedPrecondition:
+                st.error("❌ Some notes were changed by someone else since you loaded them. "
+                         "Nothing was saved; press Reload Table and re-apply your edits.")
+                # So Reload Table picks up the other writer's changes
+                refresh_patients_cache()
+            except Exception as e:
+                st.error(f"❌ Failed to save notes: {e}")
+    st.stop()
+
 # -------------------------------------------------------------
 #                   SHOW PATIENT CARDS
 # -------------------------------------------------------------
@@ -61,6 +61,15 @@ except Exception:
             level = "Low"; rec = "Maintain routine."
         return {"risk_score": risk, "risk_level": level, "ai_recommendation": rec}
 
+from utils.gemini_gateway import GeminiGateway
+
+
+# One gateway per app process, shared by all sessions: rate limit, coalescing
+# of identical in-flight requests, and retries for 429 / transient API errors.
+@st.cache_resource
+def gemini_gateway():
+    return GeminiGateway(client.models.generate_content)
+
 
 # ✔ Default doctor assignment per department (UPDATED TO USE FULL NAMES AND IDs)
 DEPARTMENT_DOCTORS = {
@@ -172,7 +181,7 @@ def patient_chatbot():
                 # Placeholder for streaming or just showing a thinking indicator
                 with st.spinner("Assistant is thinking..."):
                     # Call the Gemini API with the system instruction config
-                    response = client.models.generate_content(
+                    response = gemini_gateway().generate(
                         model=GEMINI_MODEL,
                         contents=contents,
                         config=config # Pass the new configuration
@@ -185,6 +194,9 @@ def patient_chatbot():
             # Add assistant response to chat history using the API's expected role "model"
             st.session_state.messages.append({"role": "model", "content": assistant_response})
 
+        except TimeoutError:
+            st.error("The assistant is busy right now. Please try again in a moment.")
+            st.session_state.messages.pop() # Remove the user's last message if the API call fails
         except APIError as e:
             st.error(f"An API Error occurred: {e}. Check the console for details.")
             st.session_state.messages.pop() # Remove the user's last message if the API call fails
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pandas as pd
+
+# Add parent directory to path so utils can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.doctor_notes import changed_doctor_notes
+
+
+def make_baseline():
+    return pd.DataFrame(
+        {
+            "name": ["Ann", "Bob", "Cy"],
+            "doctor_notes": ["rest", "", None],
+            "_update_time": ["2024-05-01T10:00:00.000000001Z", "2024-05-01T11:00:00Z", None],
+        },
+        index=pd.Index(["ann_1", "bob_1", "cy_1"], name="_doc_id"),
+    )
+
+
+def test_unchanged_table_has_no_changes():
+    baseline = make_baseline()
+    assert changed_doctor_notes(baseline, baseline.copy()) == {}
+
+
+def test_changed_rows_are_paired_with_their_baseline_update_time():
+    baseline = make_baseline()
+    edited = baseline.copy()
+    edited.loc["bob_1", "doctor_notes"] = "ice twice daily"
+    edited.loc["cy_1", "doctor_notes"] = "follow up"
+
+    assert changed_doctor_notes(baseline, edited) == {
+        "bob_1": ("ice twice daily", "2024-05-01T11:00:00Z"),
+        "cy_1": ("follow up", None),
+    }
+
+
+def test_rows_are_matched_by_doc_id_not_position():
+    baseline = make_baseline()
+    edited = baseline.copy()
+    edited.loc["ann_1", "doctor_notes"] = "walk more"
+    edited = edited.iloc[::-1]  # re-sorted between render and submit
+
+    assert changed_doctor_notes(baseline, edited) == {
+        "ann_1": ("walk more", "2024-05-01T10:00:00.000000001Z"),
+    }
+
+
+def test_missing_notes_equal_empty_notes():
+    baseline = make_baseline()
+    edited = baseline.copy()
+    edited.loc["cy_1", "doctor_notes"] = ""
+    edited.loc["bob_1", "doctor_notes"] = None
+
+    assert changed_doctor_notes(baseline, edited) == {}
@@ -0,0 +1,166 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add parent directory to path so utils can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.gemini_gateway import GatewayOverloaded, GeminiGateway, ThrottlingStub
+
+CONTENTS = [{"role": "user", "parts": [{"text": "How much water should I drink?"}]}]
+
+
+def make_gateway(stub, **kwargs):
+    options = dict(rate=100, burst=10, max_workers=4, deadline=5, base_delay=0.01, max_delay=0.05)
+    options.update(kwargs)
+    return GeminiGateway(stub, **options)
+
+
+def test_retries_429_then_succeeds():
+    stub = ThrottlingStub(throttle_every=0, fail_first=2, latency=0)
+    gateway = make_gateway(stub)
+
+    response = gateway.generate(model="gemini-2.5-flash", contents=CONTENTS)
+
+    assert response.text == "stub reply #3"
+    stats = gateway.stats()
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
+    assert stats["api_calls"] == 3
+    assert stats["failures"] == 0
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    stub = ThrottlingStub(throttle_every=0, latency=0.3)
+    gateway = make_gateway(stub)
+    sessions = 5
+    barrier = threading.Barrier(sessions)
+    replies = []
+
+    def ask():
+        barrier.wait()
+        replies.append(gateway.generate(model="gemini-2.5-flash", contents=CONTENTS).text)
+
+    threads = [threading.Thread(target=ask) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert stub.calls == 1
+    assert replies == ["stub reply #1"] * sessions
+    stats = gateway.stats()
+    assert stats["requests"] == sessions
+    assert stats["coalesced"] == sessions - 1
+
+
+def test_deadline_exceeded_raises_timeout():
+    stub = ThrottlingStub(throttle_every=1, latency=0)
+    gateway = make_gateway(stub, deadline=0.3, base_delay=0.05, max_delay=0.1)
+
+    with pytest.raises(TimeoutError):
+        gateway.generate(model="gemini-2.5-flash", contents=CONTENTS)
+
+    stats = gateway.stats()
+    assert stats["failures"] == 1
+    assert stats["retries"] >= 1
+
+
+def test_non_retryable_error_is_not_retried():
+    stub = ThrottlingStub(throttle_every=0, fail_first=1, error_code=400, latency=0)
+    gateway = make_gateway(stub)
+
+    with pytest.raises(ThrottlingStub.Throttled) as excinfo:
+        gateway.generate(model="gemini-2.5-flash", contents=CONTENTS)
+
+    assert excinfo.value.code == 400
+    assert stub.calls == 1
+    stats = gateway.stats()
+    assert stats["retries"] == 0
+    assert stats["throttled"] == 0
+    assert stats["failures"] == 1
+
+
+def test_rate_limit_wait_is_measured():
+    stub = ThrottlingStub(throttle_every=0, latency=0)
+    gateway = make_gateway(stub, rate=10, burst=1, max_workers=1)
+
+    gateway.generate(model="gemini-2.5-flash", contents=CONTENTS)
+    gateway.generate(model="gemini-2.5-flash", contents=CONTENTS + CONTENTS)
+
+    # Second call had to wait ~0.1 s for a token
+    assert gateway.stats()["bucket_wait_max"] >= 0.05
+
+
+def run_concurrently(gateway, questions):
+    results = [None] * len(questions)
+
+    def ask(i):
+        contents = [{"role": "user", "parts": [{"text": questions[i]}]}]
+        try:
+            results[i] = gateway.generate(model="gemini-2.5-flash", contents=contents).text
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(questions))]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)  # keep submission order stable
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_requests_past_their_deadline_are_not_sent():
+    stub = ThrottlingStub(throttle_every=0, latency=0.5)
+    gateway = make_gateway(stub, max_workers=1, deadline=0.3)
+
+    results = run_concurrently(gateway, ["q1", "q2", "q3", "q4"])
+
+    assert results[0] == "stub reply #1"
+    assert all(isinstance(r, TimeoutError) for r in results[1:])
+    assert stub.calls == 1
+    assert gateway.stats()["api_calls"] == 1
+
+
+def test_abandoned_queued_request_is_cancelled():
+    stub = ThrottlingStub(throttle_every=0, latency=1.5)
+    gateway = make_gateway(stub, max_workers=1, deadline=0.2)
+
+    results = run_concurrently(gateway, ["q1", "q2"])
+    time.sleep(0.5)  # let the worker finish the first call
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert stub.calls == 1
+    stats = gateway.stats()
+    assert stats["abandoned"] == 2
+    assert gateway.pending == 0
+
+
+def test_full_queue_rejects_immediately():
+    stub = ThrottlingStub(throttle_every=0, latency=0.3)
+    gateway = make_gateway(stub, max_workers=1, max_pending=2)
+
+    results = run_concurrently(gateway, ["q1", "q2", "q3"])
+
+    assert results[:2] == ["stub reply #1", "stub reply #2"]
+    assert isinstance(results[2], GatewayOverloaded)
+    assert gateway.stats()["rejected"] == 1
+
+
+def test_httpx_transport_errors_are_retried():
+    httpx = pytest.importorskip("httpx")
+    failures = [httpx.ConnectError("connection refused"), httpx.ReadTimeout("read timed out")]
+
+    def flaky(model, contents, config=None):
+        if failures:
+            raise failures.pop(0)
+        return ThrottlingStub.Response("ok")
+
+    gateway = make_gateway(flaky)
+
+    assert gateway.generate(model="gemini-2.5-flash", contents=CONTENTS).text == "ok"
+    assert gateway.stats()["retries"] == 2
@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+# Add parent directory to path so utils can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.doctor_notes import changed_doctor_notes
+from utils.risk_calculator import ai_health_risk_score
+from utils.shared_cache import (
+    InProcessSnapshotStore,
+    MmapSnapshotStore,
+    SharedSnapshotCache,
+    ensure_private_dir,
+    to_numpy_frame,
+)
+
+
+class CountingLoader:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return pd.DataFrame({"name": ["Ann"], "load": [self.calls]})
+
+
+def test_concurrent_stale_reads_refresh_once():
+    loader = CountingLoader(delay=0.2)
+    cache = SharedSnapshotCache(loader, ttl=0, store=InProcessSnapshotStore())
+    cache.read()
+    assert loader.calls == 1
+
+    threads = [threading.Thread(target=cache.read) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Snapshot is always stale (ttl=0), yet only the lock holder reloaded
+    assert loader.calls == 2
+
+
+def test_stale_snapshot_is_served_while_another_refresher_holds_the_lock():
+    loader = CountingLoader()
+    store = InProcessSnapshotStore()
+    cache = SharedSnapshotCache(loader, ttl=0, store=store)
+    cache.read()
+
+    assert store.acquire()      # another worker is refreshing
+    try:
+        frame = cache.read()
+    finally:
+        store.release()
+
+    assert loader.calls == 1
+    assert frame["load"].tolist() == [1]
+
+
+def test_invalidate_publishes_a_new_version():
+    loader = CountingLoader()
+    store = InProcessSnapshotStore()
+    cache = SharedSnapshotCache(loader, ttl=60, store=store)
+    cache.read()
+    assert store.latest().version == 1
+
+    frame = cache.invalidate()
+
+    assert store.latest().version == 2
+    assert frame["load"].tolist() == [2]
+
+
+def test_mmap_lock_is_exclusive_across_store_instances(tmp_path):
+    first = MmapSnapshotStore("patients", str(tmp_path))
+    second = MmapSnapshotStore("patients", str(tmp_path))
+    assert first.acquire()
+    try:
+        assert not second.acquire()
+    finally:
+        first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_mmap_readers_see_published_versions(tmp_path):
+    writer = MmapSnapshotStore("patients", str(tmp_path))
+    reader = MmapSnapshotStore("patients", str(tmp_path))
+    writer.publish(1, pd.DataFrame({"name": ["Ann"]}))
+    writer.publish(2, pd.DataFrame({"name": ["Bob"]}))
+
+    snap = reader.latest()
+    assert snap.version == 2
+    assert snap.frame["name"].tolist() == ["Bob"]
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions only")
+def test_group_or_world_accessible_dir_is_rejected(tmp_path):
+    shared = tmp_path / "cache"
+    shared.mkdir(mode=0o755)
+    os.chmod(shared, 0o755)
+
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(shared))
+    with pytest.raises(PermissionError):
+        MmapSnapshotStore("patients", str(shared))
+
+
+def test_new_cache_dir_is_private(tmp_path):
+    path = tmp_path / "fresh"
+    ensure_private_dir(str(path))
+    if hasattr(os, "getuid"):
+        assert os.stat(path).st_mode & 0o777 == 0o700
+
+
+def score_rows(df):
+    # Same argument handling as the doctor dashboard's scoring loop
+    return [
+        ai_health_risk_score(
+            steps=int(r.get("steps_walked", 0)),
+            pain_level=int(r.get("pain_level", 5)),
+            medicine_taken=str(r.get("medicine_taken", "no")).lower() == "yes",
+            sleep_hours=float(r.get("sleep_hours", 0)),
+            mood=r.get("mood"),
+        )["risk_score"]
+        for _, r in df.iterrows()
+    ]
+
+
+def test_snapshot_with_missing_fields_can_be_scored(tmp_path):
+    # Firestore docs do not all carry every field
+    patients = pd.DataFrame([
+        {"_doc_id": "ann_1", "name": "Ann", "steps_walked": 2000, "pain_level": 7,
+         "medicine_taken": "No", "sleep_hours": 5.0, "mood": "Sad",
+         "doctor_notes": "rest", "_update_time": "2024-05-01T10:00:00Z"},
+        {"_doc_id": "bob_1", "name": "Bob", "steps_walked": 9000, "pain_level": 2,
+         "medicine_taken": "Yes"},
+    ])
+    store = MmapSnapshotStore("patients", str(tmp_path))
+    store.publish(1, patients)
+    shared = MmapSnapshotStore("patients", str(tmp_path)).latest().frame
+
+    df = to_numpy_frame(shared[shared["name"].notna()])
+
+    # Scores match those of the plain frame the baseline dashboard built
+    assert score_rows(df) == score_rows(patients)
+
+    # Missing update time means "no precondition" for the notes batch
+    edited = df.set_index("_doc_id")
+    original = edited.copy()
+    edited.loc["bob_1", "doctor_notes"] = "walk daily"
+    assert changed_doctor_notes(original, edited) == {"bob_1": ("walk daily", None)}
@@ -0,0 +1,121 @@
+import os
+import sys
+from datetime import datetime
+
+# Add parent directory to path so utils can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.wearable_stream import DailyWindowAggregator, parse_samples, stream_daily_summaries
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_aggregator(now=datetime(2024, 5, 2, 12, 0), **kwargs):
+    return DailyWindowAggregator(clock=FakeClock(now), **kwargs)
+
+
+def add(agg, patient_id, ts, metric, value):
+    return agg.add(patient_id, datetime.fromisoformat(ts), metric, value)
+
+
+def test_parse_skips_bad_lines_and_values():
+    lines = [
+        "patient_id,timestamp,metric,value",
+        "",
+        "p,not-a-time,steps,10",
+        "p,2024-05-01T09:00:00,steps,inf",
+        "p,2024-05-01T09:00:00,steps,nan",
+        "p,2024-05-01T09:00:00,steps,-5",
+        "p,2024-05-01T09:00:00,heart_rate,70",
+        ",2024-05-01T09:00:00,steps,10",
+        "p,2024-05-01T09:01:00,steps,12.0",
+        "p,2024-05-01T23:00:00,sleep,DEEP",
+    ]
+    assert list(parse_samples(lines)) == [
+        ("p", datetime(2024, 5, 1, 9, 1), "steps", 12),
+        ("p", datetime(2024, 5, 1, 23, 0), "sleep", "deep"),
+    ]
+
+
+def test_watermark_is_per_patient():
+    agg = make_aggregator()
+    add(agg, "a", "2024-05-01T09:00:00", "steps", 100)
+    # b's device jumps ahead; a's open window must not be closed by it
+    closed = add(agg, "b", "2024-05-02T09:00:00", "steps", 50)
+    assert closed == []
+    assert add(agg, "a", "2024-05-01T10:00:00", "steps", 20) == []
+
+    closed = add(agg, "a", "2024-05-03T09:00:00", "steps", 5)
+    assert [(s["name"], s["steps_walked"]) for s in closed] == [("a", 120)]
+    assert agg.late_dropped == 0
+
+
+def test_late_sample_for_closed_day_is_dropped():
+    agg = make_aggregator()
+    add(agg, "a", "2024-05-01T09:00:00", "steps", 100)
+    add(agg, "a", "2024-05-03T09:00:00", "steps", 5)   # closes 05-01
+    assert add(agg, "a", "2024-05-01T23:00:00", "steps", 999) == []
+    assert agg.late_dropped == 1
+
+
+def test_far_future_sample_is_dropped():
+    agg = make_aggregator()
+    add(agg, "a", "2024-05-01T09:00:00", "steps", 100)
+    assert add(agg, "a", "2030-01-01T09:00:00", "steps", 5) == []
+    assert agg.future_dropped == 1
+    # The skewed sample did not advance a's watermark
+    assert add(agg, "a", "2024-05-01T10:00:00", "steps", 1) == []
+    assert agg.late_dropped == 0
+
+
+def test_wall_clock_closes_windows_of_silent_devices():
+    clock = FakeClock(datetime(2024, 5, 1, 12, 0))
+    agg = DailyWindowAggregator(clock=clock)
+    add(agg, "a", "2024-05-01T09:00:00", "steps", 100)
+
+    clock.now = datetime(2024, 5, 3, 0, 5)
+    closed = agg.advance()
+    assert [(s["name"], s["timestamp"]) for s in closed] == [("a", "2024-05-01 23:59:59")]
+    assert agg.windows == {}
+    # A new patient's sample for the closed day is late too
+    assert add(agg, "b", "2024-05-01T09:00:00", "steps", 1) == []
+    assert agg.late_dropped == 1
+
+
+def test_sleep_counts_toward_wake_up_day():
+    agg = make_aggregator(sleep_epoch_minutes=60)
+    for hour in ["22", "23"]:
+        add(agg, "a", f"2024-04-30T{hour}:00:00", "sleep", "light")
+    for hour in ["00", "01", "02", "03", "04", "05"]:
+        add(agg, "a", f"2024-05-01T{hour}:00:00", "sleep", "deep")
+    add(agg, "a", "2024-05-01T06:00:00", "sleep", "awake")
+
+    summaries = agg.flush()
+    assert [(s["timestamp"], s["sleep_hours"]) for s in summaries] == [("2024-05-01 23:59:59", 8.0)]
+
+
+def test_unseen_metrics_are_omitted():
+    agg = make_aggregator()
+    add(agg, "a", "2024-05-01T09:00:00", "steps", 100)
+    add(agg, "b", "2024-05-01T03:00:00", "sleep", "deep")
+
+    a, b = agg.flush()
+    assert a["steps_walked"] == 100 and "sleep_hours" not in a
+    assert b["sleep_hours"] == 0.02 and "steps_walked" not in b
+
+
+def test_stream_pipeline_emits_report_fields():
+    lines = ["a,2024-05-01T09:00:00,steps,100", "a,2024-05-01T09:01:00,steps,50"]
+    summaries = list(stream_daily_summaries(lines, clock=FakeClock(datetime(2024, 5, 1, 12, 0))))
+    assert summaries == [{
+        "name": "a",
+        "timestamp": "2024-05-01 23:59:59",
+        "source": "wearable",
+        "steps_walked": 150,
+    }]
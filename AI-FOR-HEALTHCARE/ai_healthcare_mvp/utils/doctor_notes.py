@@ -0,0 +1,22 @@
+# utils/doctor_notes.py
+
+import pandas as pd
+
+def changed_doctor_notes(original, edited):
+    """
+    Diff the notes table the doctor was shown (`original`, indexed by
+    _doc_id) against what the editor returned.
+
+    Returns {doc_id: (new_notes, update_time)} for rows whose doctor_notes
+    changed, pairing each with the _update_time from `original` so the write
+    is guarded by the version the doctor actually edited. A missing update
+    time (None/NaN/NA) is returned as None, meaning "no precondition".
+    """
+    before = original["doctor_notes"].fillna("").astype(str)
+    after = edited["doctor_notes"].fillna("").astype(str).reindex(before.index).fillna("")
+    changed = before.index[before != after]
+    out = {}
+    for doc_id in changed:
+        update_time = original.at[doc_id, "_update_time"]
+        out[doc_id] = (after[doc_id], None if pd.isna(update_time) else update_time)
+    return out
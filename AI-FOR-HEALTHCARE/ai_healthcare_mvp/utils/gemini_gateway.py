@@ -0,0 +1,250 @@
+# utils/gemini_gateway.py
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    # google-genai talks HTTP through httpx; its transport errors are not
+    # builtin ConnectionError/TimeoutError subclasses
+    import httpx
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+except ImportError:
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+
+# ----------------------------------
+# Shared Gemini gateway
+# ----------------------------------
+# One instance per app process, shared by every Streamlit session:
+#   • token bucket limits the request rate across sessions
+#   • identical in-flight requests share a single API call
+#   • a bounded worker pool caps concurrent calls, with a bounded queue
+#   • 429 / transient errors are retried with jittered backoff until a deadline
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exc):
+    """429 and 5xx API errors, plus connection-level (incl. httpx transport) failures."""
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    return getattr(exc, "code", None) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """Take one token, waiting if needed. Returns False if the deadline passes first."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class GatewayOverloaded(TimeoutError):
+    """Raised straight away when `max_pending` requests are already queued."""
+
+
+class GeminiGateway:
+    """
+    Wraps a `generate_content`-style callable. Call `generate(...)` with the
+    same keyword arguments; it returns the response or raises the last error.
+    """
+
+    def __init__(self, generate_fn, rate=2.0, burst=5, max_workers=4, deadline=30.0,
+                 base_delay=0.5, max_delay=8.0, max_pending=None):
+        self.generate_fn = generate_fn
+        self.bucket = TokenBucket(rate, burst)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini")
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_pending = max_pending or max_workers * 8
+        self.pending = 0           # submitted calls not finished or cancelled yet
+        self.in_flight = {}        # key -> {"future": ..., "waiters": n}
+        # Re-entrant: a future that is already done runs its callback inline
+        self.lock = threading.RLock()
+        self.metrics = {
+            "requests": 0,
+            "coalesced": 0,
+            "api_calls": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "rejected": 0,       # queue full
+            "abandoned": 0,      # every waiter timed out; cancelled if still queued
+            "queue_wait_total": 0.0,     # waiting for a free worker
+            "queue_wait_max": 0.0,
+            "bucket_wait_total": 0.0,    # waiting for a rate-limit token
+            "bucket_wait_max": 0.0,
+        }
+
+    def generate(self, model, contents, config=None):
+        key = (model, repr(contents), repr(config))
+        with self.lock:
+            self.metrics["requests"] += 1
+            entry = self.in_flight.get(key)
+            if entry is not None:
+                self.metrics["coalesced"] += 1
+                entry["waiters"] += 1
+            else:
+                if self.pending >= self.max_pending:
+                    self.metrics["rejected"] += 1
+                    raise GatewayOverloaded("Gemini gateway queue is full")
+                deadline = time.monotonic() + self.deadline
+                future = self.pool.submit(self._call, model, contents, config,
+                                          time.monotonic(), deadline)
+                self.pending += 1
+                entry = {"future": future, "waiters": 1}
+                self.in_flight[key] = entry
+                future.add_done_callback(lambda f: self._done(key, f))
+        try:
+            # Small grace period so the worker can raise its own, more specific error
+            return entry["future"].result(timeout=self.deadline + 1)
+        except FutureTimeout:
+            if not entry["future"].done():
+                self._abandon(key, entry)
+            raise
+
+    def stats(self):
+        with self.lock:
+            out = dict(self.metrics)
+        calls = out["requests"] - out["coalesced"]
+        out["queue_wait_avg"] = round(out["queue_wait_total"] / calls, 4) if calls else 0.0
+        attempts = out["api_calls"]
+        out["bucket_wait_avg"] = round(out["bucket_wait_total"] / attempts, 4) if attempts else 0.0
+        return out
+
+    def _done(self, key, future):
+        with self.lock:
+            self.pending -= 1
+            entry = self.in_flight.get(key)
+            if entry is not None and entry["future"] is future:
+                del self.in_flight[key]
+
+    def _abandon(self, key, entry):
+        """Last waiter gave up: stop sharing the call and drop it if still queued."""
+        with self.lock:
+            entry["waiters"] -= 1
+            if entry["waiters"] > 0:
+                return
+            self.metrics["abandoned"] += 1
+            if self.in_flight.get(key) is entry:
+                del self.in_flight[key]
+            entry["future"].cancel()
+
+    def _record(self, name, amount=1):
+        with self.lock:
+            self.metrics[name] += amount
+
+    def _record_wait(self, name, waited):
+        with self.lock:
+            self.metrics[f"{name}_total"] += waited
+            self.metrics[f"{name}_max"] = max(self.metrics[f"{name}_max"], waited)
+
+    def _call(self, model, contents, config, submitted, deadline):
+        self._record_wait("queue_wait", time.monotonic() - submitted)
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            acquired = self.bucket.acquire(deadline)
+            self._record_wait("bucket_wait", time.monotonic() - started)
+            if not acquired:
+                self._record("failures")
+                raise TimeoutError("Gemini request timed out waiting for rate limit")
+            if time.monotonic() >= deadline:
+                # Sat in the queue too long; nobody is waiting for this any more
+                self._record("failures")
+                raise TimeoutError("Gemini request deadline passed before it was sent")
+            try:
+                self._record("api_calls")
+                return self.generate_fn(model=model, contents=contents, config=config)
+            except Exception as e:
+                if getattr(e, "code", None) == 429:
+                    self._record("throttled")
+                # Full jitter: sleep a random amount up to the exponential cap
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                if not is_retryable(e):
+                    self._record("failures")
+                    raise
+                if time.monotonic() + delay > deadline:
+                    self._record("failures")
+                    raise TimeoutError(
+                        f"Gemini request deadline exceeded after {attempt} retries"
+                    ) from e
+                self._record("retries")
+                attempt += 1
+                time.sleep(delay)
+
+
+class ThrottlingStub:
+    """
+    Local stand-in for `client.models.generate_content`, for exercising the
+    gateway offline. The first `fail_first` calls and every `throttle_every`-th
+    call after that raise an error carrying `error_code` (429 by default).
+    """
+
+    class Throttled(Exception):
+        def __init__(self, code, message):
+            super().__init__(message)
+            self.code = code
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, throttle_every=3, fail_first=0, error_code=429, latency=0.05):
+        self.throttle_every = throttle_every
+        self.fail_first = fail_first
+        self.error_code = error_code
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, model, contents, config=None):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.latency)
+        if n <= self.fail_first or (self.throttle_every and n % self.throttle_every == 0):
+            raise self.Throttled(self.error_code, f"{self.error_code} stub error")
+        return self.Response(f"stub reply #{n}")
+
+
+# ------------------------------
+# Manual Test (Optional)
+# ------------------------------
+if __name__ == "__main__":
+    stub = ThrottlingStub(throttle_every=3)
+    gateway = GeminiGateway(stub, rate=20, burst=2, max_workers=2, deadline=5, base_delay=0.05)
+
+    def ask(question):
+        contents = [{"role": "user", "parts": [{"text": question}]}]
+        return gateway.generate(model="gemini-2.5-flash", contents=contents).text
+
+    # Ten sessions, but only four distinct questions
+    questions = [f"question {i % 4}" for i in range(10)]
+    with ThreadPoolExecutor(max_workers=10) as sessions:
+        for q, reply in zip(questions, sessions.map(ask, questions)):
+            print(q, "->", reply)
+
+    print("Gateway stats:", gateway.stats())
@@ -0,0 +1,294 @@
+# utils/shared_cache.py
+
+import os
+import stat
+import time
+import tempfile
+import threading
+from collections import namedtuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ----------------------------------
+# Shared snapshot cache
+# ----------------------------------
+# Every Streamlit worker reads the same versioned snapshot instead of keeping
+# its own st.cache_data copy. Only the worker holding the refresh lock calls
+# the backend; everyone else keeps serving the current snapshot meanwhile.
+#
+# Snapshots are Arrow IPC files. Readers memory-map them and wrap the Arrow
+# columns in pandas ArrowDtype columns, so every column (strings included)
+# is a read-only view of the shared pages rather than a per-process copy.
+# Arrow is a plain data format, so reading a snapshot never executes code.
+
+Snapshot = namedtuple("Snapshot", ["version", "created_at", "frame"])
+
+
+def default_cache_dir():
+    """Per-user directory, RAM-backed via /dev/shm when available."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+    return os.path.join(base, f"ai_healthcare_cache-{user}")
+
+
+def ensure_private_dir(path):
+    """
+    Create `path` as 0700 and refuse to use it if another user owns it or it
+    is accessible to others: snapshots hold patient data and credentials.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Shared cache path is not a directory: {path}")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Shared cache directory is owned by another user: {path}")
+        if info.st_mode & 0o077:
+            raise PermissionError(f"Shared cache directory is accessible to other users: {path}")
+
+
+def _to_arrow(frame):
+    """Convert to an Arrow table; mixed-type object columns fall back to strings."""
+    columns = {}
+    for name in frame.columns:
+        col = frame[name]
+        try:
+            columns[str(name)] = pa.array(col, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[str(name)] = pa.array(col.map(lambda v: None if pd.isna(v) else str(v)))
+    return pa.table(columns)
+
+
+def to_numpy_frame(frame):
+    """
+    Copy a snapshot frame (or a filtered slice of one) into ordinary NumPy /
+    object columns, with None/NaN/NaT for missing values. Code written
+    against plain DataFrames (`if value:`, `float(value)`) breaks on pd.NA,
+    so convert the rows you are about to process, after filtering.
+    """
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Ignore pandas metadata, or the ArrowDtype columns would be restored
+    out = table.to_pandas(ignore_metadata=True)
+    out.index = frame.index
+    return out
+
+
+class MmapSnapshotStore:
+    """
+    Cross-process store: one Arrow file per snapshot version in a private
+    directory. New versions are written to a temp file and renamed into
+    place, so a reader never sees a partial snapshot and keeps its mapping
+    of the old version until it switches.
+    """
+
+    def __init__(self, name, directory=None):
+        self.name = name
+        self.directory = directory or default_cache_dir()
+        self.lock_path = os.path.join(self.directory, f"{name}.lock")
+        self._current = None
+        self._lock_fd = None
+        ensure_private_dir(self.directory)
+
+    def _path(self, version):
+        return os.path.join(self.directory, f"{self.name}.{version:012d}.arrow")
+
+    def _versions(self):
+        prefix, suffix = f"{self.name}.", ".arrow"
+        out = []
+        for entry in os.listdir(self.directory):
+            if entry.startswith(prefix) and entry.endswith(suffix):
+                try:
+                    out.append(int(entry[len(prefix):-len(suffix)]))
+                except ValueError:
+                    continue
+        return sorted(out)
+
+    def latest(self):
+        versions = self._versions()
+        if not versions:
+            return None
+        version = versions[-1]
+        if self._current is not None and self._current.version == version:
+            return self._current
+        try:
+            self._current = self._map(version)
+        except FileNotFoundError:
+            return self._current
+        return self._current
+
+    def _map(self, version):
+        source = pa.memory_map(self._path(version), "r")
+        table = pa.ipc.open_file(source).read_all()
+        created_at = float((table.schema.metadata or {}).get(b"created_at", b"0"))
+        frame = table.to_pandas(types_mapper=pd.ArrowDtype)
+        return Snapshot(version, created_at, frame)
+
+    def publish(self, version, frame):
+        created_at = time.time()
+        table = _to_arrow(frame)
+        table = table.replace_schema_metadata({"created_at": repr(created_at)})
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self._path(version))
+        self._prune(keep=version)
+        self._current = self._map(version)
+        return self._current
+
+    def _prune(self, keep):
+        for version in self._versions():
+            if version < keep:
+                try:
+                    os.remove(self._path(version))
+                except OSError:
+                    # Still mapped by a reader on platforms that forbid it;
+                    # the next refresh will try again.
+                    pass
+
+    def acquire(self):
+        """
+        Non-blocking, cross-process refresh lock. It is an OS file lock on an
+        open descriptor, so the kernel drops it if the refresher dies.
+        """
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        fd, self._lock_fd = self._lock_fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+class InProcessSnapshotStore:
+    """Same interface as MmapSnapshotStore, kept in memory (tests, single process)."""
+
+    def __init__(self):
+        self._current = None
+        self._lock = threading.Lock()
+
+    def latest(self):
+        return self._current
+
+    def publish(self, version, frame):
+        self._current = Snapshot(version, time.time(), frame)
+        return self._current
+
+    def acquire(self):
+        return self._lock.acquire(blocking=False)
+
+    def release(self):
+        self._lock.release()
+
+
+class SharedSnapshotCache:
+    """
+    Serves `loader()` results from a shared, versioned snapshot.
+    A stale snapshot is refreshed by whichever caller wins the store's lock;
+    the others return the stale version instead of hitting the backend too.
+    """
+
+    def __init__(self, loader, ttl, store, wait_timeout=30):
+        self.loader = loader
+        self.ttl = ttl
+        self.store = store
+        self.wait_timeout = wait_timeout
+
+    def read(self):
+        snap = self.store.latest()
+        if snap is None:
+            return self._wait_for_snapshot().frame
+        if time.time() - snap.created_at > self.ttl and self.store.acquire():
+            try:
+                snap = self._refresh()
+            except Exception as e:
+                print("❌ Shared cache refresh failed, serving stale snapshot:", str(e))
+            finally:
+                self.store.release()
+        return snap.frame
+
+    def invalidate(self):
+        """Publish a fresh snapshot now (e.g. after this process wrote to the backend)."""
+        deadline = time.time() + self.wait_timeout
+        while not self.store.acquire():
+            if time.time() > deadline:
+                raise TimeoutError("Timed out waiting for shared cache refresh lock")
+            time.sleep(0.05)
+        try:
+            return self._refresh().frame
+        finally:
+            self.store.release()
+
+    def _refresh(self):
+        latest = self.store.latest()
+        version = (latest.version if latest else 0) + 1
+        return self.store.publish(version, self.loader())
+
+    def _wait_for_snapshot(self):
+        deadline = time.time() + self.wait_timeout
+        while True:
+            if self.store.acquire():
+                try:
+                    # Another process may have published while we waited
+                    return self.store.latest() or self._refresh()
+                finally:
+                    self.store.release()
+            snap = self.store.latest()
+            if snap is not None:
+                return snap
+            if time.time() > deadline:
+                raise TimeoutError("Timed out waiting for first shared snapshot")
+            time.sleep(0.05)
+
+
+# ------------------------------
+# Manual Test (Optional)
+# ------------------------------
+if __name__ == "__main__":
+    calls = []
+
+    def load():
+        calls.append(1)
+        return pd.DataFrame({
+            "name": ["john_doe", "jane_roe"],
+            "pain_level": [7, 2],
+            "timestamp_parsed": pd.to_datetime(["2024-05-01", "2024-05-02"]),
+        })
+
+    with tempfile.TemporaryDirectory() as d:
+        writer = SharedSnapshotCache(load, ttl=60, store=MmapSnapshotStore("patients", d))
+        reader = SharedSnapshotCache(load, ttl=60, store=MmapSnapshotStore("patients", d))
+        print(writer.read())
+        df = reader.read()
+        print("backend calls:", len(calls))
+        print("column types:", dict(df.dtypes.astype(str)))
+        print("lock is exclusive:", writer.store.acquire() and not reader.store.acquire())
+        writer.store.release()
+        writer.invalidate()
+        print("reader sees version:", reader.store.latest().version, "backend calls:", len(calls))
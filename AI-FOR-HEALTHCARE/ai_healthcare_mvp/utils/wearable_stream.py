@@ -0,0 +1,227 @@
+# utils/wearable_stream.py
+
+import gzip
+import math
+import socket
+from datetime import datetime, timedelta
+
+
+# ----------------------------------
+# Sample format
+# ----------------------------------
+# One sample per line:   patient_id,timestamp,metric,value
+#   steps  -> value is the step count for that minute
+#   sleep  -> value is the sleep stage for that epoch (awake/light/deep/rem)
+# Lines that cannot be parsed (headers, blanks, bad values) are skipped.
+
+SLEEP_EPOCH_MINUTES = 1
+AWAKE_STAGES = {"awake", "wake", "out_of_bed"}
+# Sleep window runs noon-to-noon and is reported on the wake-up day
+SLEEP_DAY_ROLLOVER_HOUR = 12
+
+
+def iter_file_lines(paths):
+    """Yield lines from one or more sample files (plain or .gz) without loading them."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+
+def iter_socket_lines(host, port, timeout=None):
+    """Yield newline-delimited samples from a TCP socket until the peer closes it."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        with sock.makefile("r", encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+
+def parse_samples(lines):
+    """Yield (patient_id, datetime, metric, value) tuples from raw sample lines."""
+    for line in lines:
+        parts = line.strip().split(",")
+        if len(parts) != 4:
+            continue
+        patient_id, ts, metric, value = (p.strip() for p in parts)
+        metric = metric.lower()
+        try:
+            when = datetime.fromisoformat(ts)
+            if metric == "steps":
+                count = float(value)
+                if not math.isfinite(count) or count < 0:
+                    continue
+                value = int(count)
+            elif metric == "sleep":
+                value = value.lower()
+            else:
+                continue
+        except (ValueError, OverflowError):
+            continue
+        if not patient_id:
+            continue
+        yield patient_id, when, metric, value
+
+
+class DailyWindowAggregator:
+    """
+    Aggregates samples into per-patient daily windows.
+
+    Each patient has their own watermark, so one device with a skewed clock
+    or a late batch sync only affects that patient. Only windows inside a
+    patient's lateness horizon stay open, which bounds memory by
+    (patients x open days). A window closes once that patient sends a
+    sample more than `allowed_lateness_days` past its day, or once the wall
+    clock does (see `advance`), so a device that stops syncing still gets
+    its last days emitted on an endless stream. Later samples for a closed
+    day are counted and dropped, and so are samples stamped more than
+    `max_future_days` ahead of the wall clock.
+
+    Steps count toward the calendar day. Sleep counts toward the day you
+    wake up: the window runs from noon to noon, so one night is never
+    split across two reports.
+    """
+
+    def __init__(self, allowed_lateness_days=1, sleep_epoch_minutes=SLEEP_EPOCH_MINUTES,
+                 max_future_days=1, clock=datetime.now):
+        self.allowed_lateness_days = allowed_lateness_days
+        self.sleep_epoch_minutes = sleep_epoch_minutes
+        self.max_future_days = max_future_days
+        self.clock = clock
+        self.windows = {}          # patient_id -> {date: window}
+        self.watermarks = {}       # patient_id -> days before this date are closed
+        self.wall_horizon = None   # days before this date are closed for everyone
+        self.late_dropped = 0
+        self.future_dropped = 0
+        self._advanced_on = None
+
+    def advance(self):
+        """
+        Close every window the wall clock has moved `allowed_lateness_days`
+        past. Runs at most once per wall-clock day; `add` calls it for you.
+        """
+        today = self.clock().date()
+        if today == self._advanced_on:
+            return []
+        self._advanced_on = today
+        horizon = today - timedelta(days=self.allowed_lateness_days)
+        self.wall_horizon = horizon
+        out = []
+        for patient_id in sorted(self.windows):
+            out.extend(self._close(patient_id, lambda d: d < horizon))
+        return out
+
+    def add(self, patient_id, when, metric, value):
+        """Add one sample; return the daily summaries it caused to close."""
+        out = self.advance()
+        if metric == "sleep":
+            day = (when + timedelta(hours=24 - SLEEP_DAY_ROLLOVER_HOUR)).date()
+        else:
+            day = when.date()
+
+        if (day - self._advanced_on).days > self.max_future_days:
+            self.future_dropped += 1
+            return out
+        watermark = self.watermarks.get(patient_id)
+        if day < self.wall_horizon or (watermark is not None and day < watermark):
+            self.late_dropped += 1
+            return out
+
+        days = self.windows.setdefault(patient_id, {})
+        window = days.setdefault(day, {"steps": None, "sleep_minutes": None})
+        if metric == "steps":
+            window["steps"] = (window["steps"] or 0) + value
+        elif metric == "sleep":
+            asleep = value not in AWAKE_STAGES
+            window["sleep_minutes"] = (window["sleep_minutes"] or 0) + \
+                (self.sleep_epoch_minutes if asleep else 0)
+
+        horizon = day - timedelta(days=self.allowed_lateness_days)
+        if watermark is None or horizon > watermark:
+            self.watermarks[patient_id] = horizon
+            out.extend(self._close(patient_id, lambda d: d < horizon))
+        return out
+
+    def flush(self):
+        """Close and return every open window (end of stream)."""
+        out = []
+        for patient_id in sorted(self.windows):
+            out.extend(self._close(patient_id, lambda d: True))
+        return out
+
+    def _close(self, patient_id, is_closed):
+        days = self.windows.get(patient_id, {})
+        closed = sorted(d for d in days if is_closed(d))
+        out = [self._summary(patient_id, d, days.pop(d)) for d in closed]
+        if not days:
+            self.windows.pop(patient_id, None)
+        return out
+
+    @staticmethod
+    def _summary(patient_id, day, window):
+        # Same field names as the daily report written by the patient app.
+        # A metric with no samples is left out rather than reported as 0, so
+        # missing device data does not read as "no sleep" or "no steps".
+        summary = {
+            "name": patient_id,
+            "timestamp": f"{day.isoformat()} 23:59:59",
+            "source": "wearable",
+        }
+        if window["steps"] is not None:
+            summary["steps_walked"] = int(window["steps"])
+        if window["sleep_minutes"] is not None:
+            summary["sleep_hours"] = round(window["sleep_minutes"] / 60.0, 2)
+        return summary
+
+
+def stream_daily_summaries(lines, allowed_lateness_days=1, sleep_epoch_minutes=SLEEP_EPOCH_MINUTES,
+                           max_future_days=1, clock=datetime.now):
+    """
+    Generator pipeline: raw lines -> parsed samples -> daily summaries.
+    Summaries are yielded as soon as their day closes, then the rest on EOF.
+    """
+    agg = DailyWindowAggregator(allowed_lateness_days, sleep_epoch_minutes, max_future_days, clock)
+    for sample in parse_samples(lines):
+        for summary in agg.add(*sample):
+            yield summary
+    for summary in agg.flush():
+        yield summary
+
+
+# ------------------------------
+# Manual Test (Optional)
+# ------------------------------
+if __name__ == "__main__":
+    from risk_calculator import ai_health_risk_score
+
+    sample_lines = [
+        "patient_id,timestamp,metric,value",
+        "john_doe,2024-04-30T22:00:00,sleep,light",  # same night ...
+        "john_doe,2024-05-01T06:00:00,sleep,deep",   # ... reported on 05-01
+        "john_doe,2024-05-01T09:00:00,steps,120",
+        "jane_roe,2024-05-01T09:00:00,steps,80",
+        "jane_roe,2030-01-01T09:00:00,steps,5",      # skewed clock, dropped
+        "john_doe,2024-05-02T09:00:00,steps,300",
+        "jane_roe,2024-05-01T23:00:00,steps,40",     # late but within horizon
+        "john_doe,2024-05-03T09:00:00,steps,50",     # closes john's 05-01
+        "john_doe,2024-05-01T23:30:00,steps,999",    # too late for john, dropped
+    ]
+
+    # Patient-entered report; the wearable fills in only what it measured
+    manual_report = {"steps_walked": 4000, "pain_level": 5, "medicine_taken": "Yes",
+                     "sleep_hours": 7.0, "mood": "Neutral"}
+
+    # Replaying 2024 samples, so pin the wall clock to when they were recorded
+    replay_clock = lambda: datetime(2024, 5, 2, 12, 0)
+    for summary in stream_daily_summaries(sample_lines, clock=replay_clock):
+        report = dict(manual_report, **summary)
+        risk = ai_health_risk_score(
+            steps=report["steps_walked"],
+            pain_level=report["pain_level"],
+            medicine_taken=report["medicine_taken"] == "Yes",
+            sleep_hours=report["sleep_hours"],
+            mood=report["mood"],
+        )
+        print(summary, "->", risk["risk_level"], risk["risk_score"])